@@ -0,0 +1,222 @@
+"""
+Live appointment status stream (server-sent events)
+An asyncio server that holds many idle connections cheaply, separate from the WSGI workers
+
+Usage: python events.py --port 5001
+Route /api/appointments/events to this process from the reverse proxy; it
+authenticates with the same session cookie as the main site.
+"""
+
+import argparse
+import asyncio
+import json
+import resource
+import sqlite3
+from urllib.parse import urlsplit, parse_qs
+from http.cookies import SimpleCookie
+
+from hospital import app, db
+
+EVENTS_PATH = '/api/appointments/events'
+POLL_INTERVAL = 0.5  # seconds between change-feed polls
+POLL_BATCH = 1000
+HEARTBEAT_INTERVAL = 15
+CLIENT_QUEUE_SIZE = 1000
+MAX_HEADER_BYTES = 16 * 1024
+
+
+def log(message):
+    print(f"[events] {message}", flush=True)
+
+
+class ChangeFeed:
+    """Tails the appointment_event table once for all clients and fans events out per user"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.subscribers = {}  # user_id -> set of asyncio.Queue
+        self.last_id = 0
+
+    def _query(self, sql, params):
+        conn = sqlite3.connect(f'file:{self.db_path}?mode=ro', uri=True, timeout=5)
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    async def fetch(self, sql, params):
+        return await asyncio.to_thread(self._query, sql, params)
+
+    async def start(self):
+        rows = await self.fetch('SELECT COALESCE(MAX(id), 0) FROM appointment_event', ())
+        self.last_id = rows[0][0]
+
+    async def run(self):
+        while True:
+            try:
+                rows = await self.fetch(
+                    'SELECT id, user_id, appointment_id, status, created_at FROM appointment_event '
+                    'WHERE id > ? ORDER BY id LIMIT ?', (self.last_id, POLL_BATCH))
+            except sqlite3.Error as e:
+                log(f"poll failed: {e}")
+                rows = []
+            for row in rows:
+                self.last_id = row[0]
+                for queue in list(self.subscribers.get(row[1], ())):
+                    try:
+                        queue.put_nowait(row)
+                    except asyncio.QueueFull:
+                        # A client this far behind is disconnected and resumes with Last-Event-ID
+                        self.unsubscribe(row[1], queue)
+                        while not queue.empty():
+                            queue.get_nowait()
+                        queue.put_nowait(None)
+            if len(rows) < POLL_BATCH:
+                await asyncio.sleep(POLL_INTERVAL)
+
+    def subscribe(self, user_id):
+        queue = asyncio.Queue(maxsize=CLIENT_QUEUE_SIZE)
+        self.subscribers.setdefault(user_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id, queue):
+        queues = self.subscribers.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self.subscribers[user_id]
+
+    async def backlog(self, user_id, after_id):
+        return await self.fetch(
+            'SELECT id, user_id, appointment_id, status, created_at FROM appointment_event '
+            'WHERE user_id = ? AND id > ? AND id <= ? ORDER BY id', (user_id, after_id, self.last_id))
+
+
+def session_user_id(cookie_header):
+    """User id from the Flask session cookie, or None"""
+    cookie = SimpleCookie()
+    try:
+        cookie.load(cookie_header or '')
+    except Exception:
+        return None
+    morsel = cookie.get(app.config.get('SESSION_COOKIE_NAME', 'session'))
+    serializer = app.session_interface.get_signing_serializer(app)
+    if morsel is None or serializer is None:
+        return None
+    try:
+        data = serializer.loads(morsel.value, max_age=int(app.permanent_session_lifetime.total_seconds()))
+    except Exception:
+        return None
+    return data.get('user_id')
+
+
+def format_event(row):
+    event_id, _, appointment_id, status, created_at = row
+    data = json.dumps({'appointment_id': appointment_id, 'status': status, 'at': created_at})
+    return f"id: {event_id}\nevent: status\ndata: {data}\n\n".encode('utf-8')
+
+
+async def read_request(reader):
+    """Request line, path, query and lower-cased headers of an HTTP/1.1 request"""
+    head = await reader.readuntil(b'\r\n\r\n')
+    if len(head) > MAX_HEADER_BYTES:
+        raise ValueError('headers too large')
+    lines = head.decode('latin-1').split('\r\n')
+    method, target, _ = lines[0].split(' ', 2)
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+    url = urlsplit(target)
+    return method, url.path, parse_qs(url.query), headers
+
+
+def simple_response(writer, status, message):
+    body = message.encode('utf-8')
+    writer.write(f"HTTP/1.1 {status}\r\nContent-Type: text/plain\r\nContent-Length: {len(body)}\r\n"
+                 f"Connection: close\r\n\r\n".encode('latin-1') + body)
+
+
+async def handle_client(feed, reader, writer):
+    user_id = queue = None
+    try:
+        try:
+            method, path, query, headers = await asyncio.wait_for(read_request(reader), timeout=10)
+        except (ValueError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError):
+            simple_response(writer, '400 Bad Request', 'Bad request')
+            return
+        if path != EVENTS_PATH:
+            simple_response(writer, '404 Not Found', 'Not found')
+            return
+        if method != 'GET':
+            simple_response(writer, '405 Method Not Allowed', 'Method not allowed')
+            return
+        user_id = session_user_id(headers.get('cookie'))
+        if user_id is None:
+            simple_response(writer, '401 Unauthorized', 'Not authenticated')
+            return
+
+        # Subscribe before reading the backlog so nothing committed in between is missed
+        queue = feed.subscribe(user_id)
+        resume_from = headers.get('last-event-id') or query.get('last_event_id', [None])[0]
+        last_sent = int(resume_from) if resume_from and resume_from.isdigit() else feed.last_id
+
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+                     b"Connection: keep-alive\r\nX-Accel-Buffering: no\r\n\r\nretry: 3000\n\n")
+        for row in await feed.backlog(user_id, last_sent):
+            writer.write(format_event(row))
+            last_sent = row[0]
+        await writer.drain()
+
+        while True:
+            try:
+                row = await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_INTERVAL)
+            except asyncio.TimeoutError:
+                writer.write(b": keepalive\n\n")
+            else:
+                if row is None:
+                    return
+                if row[0] <= last_sent:
+                    continue
+                writer.write(format_event(row))
+                last_sent = row[0]
+            await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        if queue is not None:
+            feed.unsubscribe(user_id, queue)
+        writer.close()
+
+
+def raise_open_file_limit():
+    # Every idle client holds a socket; allow as many as the hard limit permits
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    return resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+
+
+async def serve(host, port):
+    with app.app_context():
+        db_path = db.engine.url.database
+    feed = ChangeFeed(db_path)
+    await feed.start()
+    server = await asyncio.start_server(lambda r, w: handle_client(feed, r, w), host, port,
+                                        limit=MAX_HEADER_BYTES, backlog=1024)
+    log(f"streaming {EVENTS_PATH} on {host}:{port} (max {raise_open_file_limit()} open files)")
+    async with server:
+        await asyncio.gather(server.serve_forever(), feed.run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Appointment status event stream')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5001)
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port))
+
+
+if __name__ == '__main__':
+    main()
@@ -5,9 +5,28 @@ Complete solution with Flask backend, departments, and user-friendly interface
 
 import os
 import json
-from datetime import datetime
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
+import time
+import sqlite3
+import hashlib
+import gzip
+import shutil
+import tempfile
+import threading
+import multiprocessing
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import uuid
+from urllib.parse import urlsplit, parse_qsl
+from functools import wraps, lru_cache
+from datetime import datetime, timedelta, timezone
+import click
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, g, send_file, abort
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, inspect as sa_inspect
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.schema import CreateTable
+from werkzeug.exceptions import HTTPException
+from werkzeug.middleware.proxy_fix import ProxyFix
 from werkzeug.security import generate_password_hash, check_password_hash
 import matplotlib
 matplotlib.use('Agg')  # Use non-interactive backend
@@ -17,12 +36,28 @@ from io import BytesIO
 import base64
 from PIL import Image, ImageDraw, ImageFont
 import io
+import photos
+
+try:
+    import msgpack
+except ImportError:  # MessagePack responses are optional
+    msgpack = None
 
 # Initialize Flask app
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'children_hospital_secret_key_2023'
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///hospital.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['ADMISSION_CONTROL'] = True
+app.config['RATELIMIT_DB'] = os.path.join(app.instance_path, 'ratelimit.db')
+app.config['PHOTO_CACHE_DIR'] = os.path.join(app.instance_path, 'photo_cache')
+app.config['ARCHIVE_AFTER_DAYS'] = 365
+app.config['SNAPSHOT_DIR'] = os.path.join(app.instance_path, 'snapshots')
+# Reverse proxies in front of the app whose X-Forwarded-For entries are trusted
+app.config['TRUSTED_PROXY_HOPS'] = int(os.environ.get('HOSP_TRUSTED_PROXY_HOPS', 0))
+
+if app.config['TRUSTED_PROXY_HOPS']:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['TRUSTED_PROXY_HOPS'])
 
 # Initialize database
 db = SQLAlchemy(app)
@@ -78,6 +113,45 @@ class Appointment(db.Model):
     # Relationships
     doctor = db.relationship('Doctor', backref='appointments', lazy=True)
     department = db.relationship('Department', backref='appointments', lazy=True)
+    
+    # Keyset-pagination indexes for the admin console filters and sorts. Ids are
+    # never reused (AUTOINCREMENT) because archived rows, appointment events and
+    # queued job payloads keep referring to them after a row leaves this table.
+    __table_args__ = (
+        db.Index('ix_appointment_date_id', 'appointment_date', 'id'),
+        db.Index('ix_appointment_created_id', 'created_at', 'id'),
+        db.Index('ix_appointment_status_date_id', 'status', 'appointment_date', 'id'),
+        db.Index('ix_appointment_department_date_id', 'department_id', 'appointment_date', 'id'),
+        db.Index('ix_appointment_doctor_date_id', 'doctor_id', 'appointment_date', 'id'),
+        db.Index('ix_appointment_status_created_id', 'status', 'created_at', 'id'),
+        db.Index('ix_appointment_department_created_id', 'department_id', 'created_at', 'id'),
+        db.Index('ix_appointment_doctor_created_id', 'doctor_id', 'created_at', 'id'),
+        db.Index('ix_appointment_user_date', 'user_id', 'appointment_date'),
+        {'sqlite_autoincrement': True},
+    )
+
+class ArchivedAppointment(db.Model):
+    # Completed/cancelled appointments moved out of the hot table by archive_appointments()
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    doctor_id = db.Column(db.Integer, db.ForeignKey('doctor.id'), nullable=False)
+    department_id = db.Column(db.Integer, db.ForeignKey('department.id'), nullable=False)
+    child_name = db.Column(db.String(100), nullable=False)
+    child_age = db.Column(db.Integer, nullable=False)
+    appointment_date = db.Column(db.DateTime, nullable=False)
+    symptoms = db.Column(db.Text)
+    status = db.Column(db.String(20), nullable=False)
+    created_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    # Relationships
+    user = db.relationship('User', lazy=True)
+    doctor = db.relationship('Doctor', lazy=True)
+    department = db.relationship('Department', lazy=True)
+    
+    __table_args__ = (
+        db.Index('ix_archived_appointment_user_date', 'user_id', 'appointment_date', 'id'),
+    )
 
 class MedicalRecord(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -99,9 +173,98 @@ class Medicine(db.Model):
     category = db.Column(db.String(50))  # syrup, tablet, injection, etc.
     for_age = db.Column(db.String(50))  # age group
 
+class Job(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text)  # JSON string of handler arguments
+    status = db.Column(db.String(20), default='queued', nullable=False)  # queued, running, failed
+    run_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    max_attempts = db.Column(db.Integer, default=5, nullable=False)
+    locked_by = db.Column(db.String(32))
+    locked_until = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_job_status_run_at', 'status', 'run_at'),
+        db.Index('ix_job_locked_by', 'locked_by'),
+    )
+
+class AppointmentEvent(db.Model):
+    # Change feed of appointment status changes; id doubles as the SSE event id, so
+    # AUTOINCREMENT keeps ids rising even after prune_appointment_events() empties the table
+    id = db.Column(db.Integer, primary_key=True)
+    appointment_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(20), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    __table_args__ = (
+        db.Index('ix_appointment_event_user_id', 'user_id', 'id'),
+        {'sqlite_autoincrement': True},
+    )
+
+class StatCounter(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    metric = db.Column(db.String(30), nullable=False)  # doctors, appointments, pending_appointments
+    # Unused dimensions are stored as 0/'' rather than NULL so the unique key can be upserted
+    department_id = db.Column(db.Integer, default=0, nullable=False)
+    doctor_id = db.Column(db.Integer, default=0, nullable=False)
+    day = db.Column(db.String(10), default='', nullable=False)  # YYYY-MM-DD
+    status = db.Column(db.String(20), default='', nullable=False)
+    value = db.Column(db.Integer, default=0, nullable=False)
+    
+    __table_args__ = (
+        db.UniqueConstraint('metric', 'department_id', 'doctor_id', 'day', 'status', name='uq_stat_counter_key'),
+    )
+
+def ensure_autoincrement(model, *history_models):
+    """Rebuild a table created before it used AUTOINCREMENT, and keep its id
+    sequence past every id already copied into the given history tables"""
+    table = model.__table__
+    with db.engine.connect() as conn:
+        conn.exec_driver_sql('BEGIN IMMEDIATE')
+        table_sql = conn.execute(db.text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                                 {'name': table.name}).scalar()
+        if 'AUTOINCREMENT' not in table_sql.upper():
+            # SQLite cannot alter a primary key in place: copy into a new table and swap it in
+            staging = f'{table.name}_rebuild'
+            columns = ', '.join(column.name for column in table.columns)
+            conn.exec_driver_sql(str(CreateTable(table).compile(conn)).replace(
+                f'CREATE TABLE {table.name} (', f'CREATE TABLE {staging} (', 1))
+            conn.exec_driver_sql(f'INSERT INTO {staging} ({columns}) SELECT {columns} FROM {table.name}')
+            conn.exec_driver_sql(f'DROP TABLE {table.name}')
+            conn.exec_driver_sql(f'ALTER TABLE {staging} RENAME TO {table.name}')
+            for index in table.indexes:
+                index.create(conn)
+        
+        highest = max(conn.execute(db.select(db.func.coalesce(db.func.max(m.id), 0))).scalar()
+                      for m in (model,) + history_models)
+        sequence = conn.execute(db.text('SELECT seq FROM sqlite_sequence WHERE name = :name'),
+                                {'name': table.name}).scalar()
+        if sequence is None:
+            conn.execute(db.text('INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :seq)'),
+                         {'name': table.name, 'seq': highest})
+        elif sequence < highest:
+            conn.execute(db.text('UPDATE sqlite_sequence SET seq = :seq WHERE name = :name'),
+                         {'name': table.name, 'seq': highest})
+        conn.commit()
+
 # Create database tables
 with app.app_context():
+    # WAL lets readers (including online snapshots) run alongside writers
+    @event.listens_for(db.engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        dbapi_connection.execute('PRAGMA journal_mode=WAL')
+    
     db.create_all()
+    ensure_autoincrement(Appointment, ArchivedAppointment)
+    ensure_autoincrement(AppointmentEvent)
+    # create_all() skips tables that already exist, so add any indexes they are missing
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
 
 # Hospital Departments Data
 DEPARTMENTS_DATA = [
@@ -172,6 +335,7 @@ DEPARTMENTS_DATA = [
 ]
 
 # Function to create hospital logo
+@lru_cache(maxsize=None)
 def create_hospital_logo_svg():
     """Generate hospital logo as SVG"""
     svg_logo = '''
@@ -248,6 +412,441 @@ def initialize_data():
             
             db.session.commit()
             print("Database initialized with sample data")
+        
+        # Databases created before the counters table existed need one full build
+        if StatCounter.query.count() == 0 and Doctor.query.count() > 0:
+            rebuild_counters()
+            print("Aggregate counters built")
+
+# Aggregate counters
+# StatCounter rows are kept in step with Doctor and Appointment inside the
+# same flush, so statistics are single-row reads instead of table scans.
+COUNTER_KEY_COLUMNS = ('metric', 'department_id', 'doctor_id', 'day', 'status')
+
+def doctor_counter_keys(department_id):
+    """Counter keys a doctor contributes to"""
+    return [
+        ('doctors', 0, 0, '', ''),
+        ('doctors', int(department_id), 0, '', ''),
+    ]
+
+def appointment_counter_keys(department_id, doctor_id, appointment_date, status):
+    """Counter keys an appointment contributes to"""
+    status = status or 'pending'
+    keys = [('appointments', int(department_id), 0, appointment_date.strftime('%Y-%m-%d'), status)]
+    if status == 'pending':
+        keys.append(('pending_appointments', 0, int(doctor_id), '', ''))
+    return keys
+
+def apply_counter_deltas(connection, deltas):
+    """Upsert {counter key: delta} into the counters table on the given connection"""
+    rows = [dict(zip(COUNTER_KEY_COLUMNS, key), value=delta) for key, delta in deltas.items() if delta]
+    if not rows:
+        return
+    table = StatCounter.__table__
+    stmt = sqlite_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(COUNTER_KEY_COLUMNS),
+        set_={'value': table.c.value + stmt.excluded.value}
+    )
+    connection.execute(stmt, rows)
+
+def _previous_value(obj, attr):
+    history = sa_inspect(obj).attrs[attr].history
+    return history.deleted[0] if history.deleted else getattr(obj, attr)
+
+def _add_keys(deltas, keys, delta):
+    for key in keys:
+        deltas[key] = deltas.get(key, 0) + delta
+
+@event.listens_for(db.session, 'before_flush')
+def update_counters_before_flush(session, flush_context, instances):
+    """Translate pending Doctor/Appointment changes into counter deltas"""
+    deltas = {}
+    for obj in session.new:
+        if isinstance(obj, Doctor):
+            _add_keys(deltas, doctor_counter_keys(obj.department_id), 1)
+        elif isinstance(obj, Appointment):
+            _add_keys(deltas, appointment_counter_keys(obj.department_id, obj.doctor_id, obj.appointment_date, obj.status), 1)
+    
+    for obj in session.deleted:
+        if isinstance(obj, Doctor):
+            _add_keys(deltas, doctor_counter_keys(_previous_value(obj, 'department_id')), -1)
+        elif isinstance(obj, Appointment):
+            _add_keys(deltas, appointment_counter_keys(
+                *(_previous_value(obj, attr) for attr in ('department_id', 'doctor_id', 'appointment_date', 'status'))), -1)
+    
+    for obj in session.dirty:
+        if not session.is_modified(obj):
+            continue
+        if isinstance(obj, Doctor):
+            _add_keys(deltas, doctor_counter_keys(_previous_value(obj, 'department_id')), -1)
+            _add_keys(deltas, doctor_counter_keys(obj.department_id), 1)
+        elif isinstance(obj, Appointment):
+            _add_keys(deltas, appointment_counter_keys(
+                *(_previous_value(obj, attr) for attr in ('department_id', 'doctor_id', 'appointment_date', 'status'))), -1)
+            _add_keys(deltas, appointment_counter_keys(obj.department_id, obj.doctor_id, obj.appointment_date, obj.status), 1)
+    
+    apply_counter_deltas(session.connection(), deltas)
+
+@event.listens_for(db.session, 'after_flush')
+def record_appointment_events(session, flush_context):
+    """Append new appointments and status changes to the change feed in the same transaction"""
+    # Runs after the INSERTs so new appointments have ids; new/dirty still hold this flush's objects
+    now = datetime.utcnow()
+    rows = []
+    for obj in session.new:
+        if isinstance(obj, Appointment):
+            rows.append({'appointment_id': obj.id, 'user_id': obj.user_id, 'status': obj.status or 'pending', 'created_at': now})
+    for obj in session.dirty:
+        if isinstance(obj, Appointment) and sa_inspect(obj).attrs.status.history.deleted:
+            rows.append({'appointment_id': obj.id, 'user_id': obj.user_id, 'status': obj.status, 'created_at': now})
+    if rows:
+        session.connection().execute(db.insert(AppointmentEvent.__table__), rows)
+
+def prune_appointment_events(days):
+    """Delete change-feed entries older than the given number of days"""
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    result = db.session.execute(db.delete(AppointmentEvent.__table__).where(AppointmentEvent.created_at < cutoff))
+    db.session.commit()
+    return result.rowcount
+
+@app.cli.command('prune-events')
+@click.option('--days', default=7, help='Keep events newer than this many days')
+def prune_events_command(days):
+    """Trim the appointment change feed"""
+    print(f"{prune_appointment_events(days)} appointment events pruned")
+
+def rebuild_counters():
+    """Recompute every counter from the source tables"""
+    table = StatCounter.__table__
+    columns = list(COUNTER_KEY_COLUMNS) + ['value']
+    # Archived appointments still count towards historical per-day statistics
+    appointments = db.union_all(*(
+        db.select(model.department_id, model.doctor_id, model.appointment_date,
+                  db.func.coalesce(model.status, 'pending').label('status'))
+        for model in (Appointment, ArchivedAppointment)
+    )).subquery()
+    
+    db.session.execute(db.delete(table))
+    db.session.execute(db.insert(table).from_select(columns, db.select(
+        db.literal('doctors'), db.literal(0), db.literal(0), db.literal(''), db.literal(''), db.func.count(Doctor.id))))
+    db.session.execute(db.insert(table).from_select(columns, db.select(
+        db.literal('doctors'), Doctor.department_id, db.literal(0), db.literal(''), db.literal(''), db.func.count(Doctor.id)
+    ).group_by(Doctor.department_id)))
+    day = db.func.date(appointments.c.appointment_date)
+    db.session.execute(db.insert(table).from_select(columns, db.select(
+        db.literal('appointments'), appointments.c.department_id, db.literal(0), day, appointments.c.status, db.func.count()
+    ).group_by(appointments.c.department_id, day, appointments.c.status)))
+    db.session.execute(db.insert(table).from_select(columns, db.select(
+        db.literal('pending_appointments'), db.literal(0), appointments.c.doctor_id, db.literal(''), db.literal(''), db.func.count()
+    ).where(appointments.c.status == 'pending').group_by(appointments.c.doctor_id)))
+    db.session.commit()
+
+def get_counter(metric, department_id=0, doctor_id=0, day='', status=''):
+    """Read a single counter value"""
+    value = db.session.query(StatCounter.value).filter_by(
+        metric=metric, department_id=department_id, doctor_id=doctor_id, day=day, status=status
+    ).scalar()
+    return value or 0
+
+def department_appointment_counts(department_id, day):
+    """Appointments in a department on a given date, keyed by status"""
+    rows = db.session.query(StatCounter.status, StatCounter.value).filter_by(
+        metric='appointments', department_id=department_id, doctor_id=0, day=day.strftime('%Y-%m-%d')
+    ).all()
+    return {status: value for status, value in rows if value}
+
+def department_doctor_counts():
+    """Live doctor count per department, keyed by department id"""
+    rows = db.session.query(StatCounter.department_id, StatCounter.value).filter(
+        StatCounter.metric == 'doctors', StatCounter.department_id != 0
+    ).all()
+    return dict(rows)
+
+def pending_appointments_count(doctor_id):
+    """Pending appointments currently assigned to a doctor"""
+    return get_counter('pending_appointments', doctor_id=doctor_id)
+
+@app.cli.command('rebuild-counters')
+def rebuild_counters_command():
+    """Rebuild the aggregate counters table from scratch"""
+    rebuild_counters()
+    print("Counters rebuilt")
+
+# Background jobs
+# Follow-up work is written to the job table in the same transaction as the
+# business row and executed later by `flask --app hospital worker`.
+JOB_HANDLERS = {}
+JOB_LEASE_SECONDS = 300
+JOB_RETRY_BASE_SECONDS = 30
+JOB_RETRY_MAX_SECONDS = 3600
+
+def local_to_utc(value):
+    """Naive UTC equivalent of a naive wall-clock time in the server's local timezone"""
+    # Job run_at values are compared with datetime.utcnow(); appointment times are local
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+def job_handler(kind):
+    """Register a function as the handler for a job kind"""
+    def decorator(func):
+        JOB_HANDLERS[kind] = func
+        return func
+    return decorator
+
+def enqueue_job(kind, payload=None, run_at=None, max_attempts=5):
+    """Add a job to the current session; it is committed with the caller's transaction"""
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f'Unknown job kind: {kind}')
+    job = Job(
+        kind=kind,
+        payload=json.dumps(payload or {}),
+        run_at=run_at or datetime.utcnow(),
+        max_attempts=max_attempts
+    )
+    db.session.add(job)
+    return job
+
+def claim_jobs(batch_size=10, lease_seconds=JOB_LEASE_SECONDS):
+    """Lease up to batch_size due jobs to this worker with a single UPDATE; returns (token, jobs)"""
+    now = datetime.utcnow()
+    token = uuid.uuid4().hex
+    # A job whose worker died or hung on its last attempt is given up on instead of re-leased forever
+    db.session.execute(
+        db.update(Job)
+        .where(Job.status == 'running', Job.locked_until < now, Job.attempts >= Job.max_attempts)
+        .values(status='failed', locked_by=None, locked_until=None,
+                last_error=db.func.coalesce(Job.last_error, 'Lease expired on the final attempt'))
+        .execution_options(synchronize_session=False)
+    )
+    claimable = db.or_(
+        db.and_(Job.status == 'queued', Job.run_at <= now),
+        # Jobs whose worker died mid-run become claimable again once the lease expires
+        db.and_(Job.status == 'running', Job.locked_until < now)
+    )
+    due_ids = db.select(Job.id).where(claimable).order_by(Job.run_at).limit(batch_size)
+    db.session.execute(
+        db.update(Job)
+        .where(Job.id.in_(due_ids), claimable)
+        .values(status='running', locked_by=token,
+                locked_until=now + timedelta(seconds=lease_seconds),
+                attempts=Job.attempts + 1)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return token, Job.query.filter_by(locked_by=token, status='running').order_by(Job.run_at).all()
+
+def run_job(job, token):
+    """Execute one job leased with token, deleting it on success and rescheduling it on failure"""
+    # Every write below is conditional on still holding the lease; once it expires
+    # another worker may own the job and this worker's outcome must be discarded.
+    job_id, kind = job.id, job.kind
+    attempts, max_attempts = job.attempts, job.max_attempts
+    leased = db.and_(Job.id == job_id, Job.locked_by == token)
+    try:
+        JOB_HANDLERS[kind](**json.loads(job.payload or '{}'))
+    except Exception as e:
+        db.session.rollback()
+        error = f'{type(e).__name__}: {e}'
+        if attempts >= max_attempts:
+            values = {'status': 'failed'}
+        else:
+            delay = min(JOB_RETRY_BASE_SECONDS * 2 ** (attempts - 1), JOB_RETRY_MAX_SECONDS)
+            values = {'status': 'queued', 'run_at': datetime.utcnow() + timedelta(seconds=delay)}
+        result = db.session.execute(
+            db.update(Job).where(leased)
+            .values(last_error=error, locked_by=None, locked_until=None, **values)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        if result.rowcount and attempts >= max_attempts:
+            app.logger.error('Job %s (%s) failed permanently: %s', job_id, kind, error)
+        return False
+    
+    # The delete commits together with the handler's own writes
+    result = db.session.execute(db.delete(Job).where(leased).execution_options(synchronize_session=False))
+    if not result.rowcount:
+        db.session.rollback()
+        app.logger.warning('Job %s (%s) lost its lease while running; result discarded', job_id, kind)
+        return False
+    db.session.commit()
+    return True
+
+def run_worker(batch_size=10, poll_interval=1.0, once=False):
+    """Process due jobs until stopped (or until the queue is drained when once=True)"""
+    with app.app_context():
+        while True:
+            token, jobs = claim_jobs(batch_size)
+            for job in jobs:
+                run_job(job, token)
+            if not jobs:
+                if once:
+                    return
+                time.sleep(poll_interval)
+
+@job_handler('send_welcome_message')
+def send_welcome_message(user_id):
+    user = User.query.get(user_id)
+    if user:
+        app.logger.info('Welcome message sent to %s <%s>', user.username, user.email)
+
+@job_handler('send_appointment_confirmation')
+def send_appointment_confirmation(appointment_id):
+    appointment = Appointment.query.get(appointment_id)
+    if appointment:
+        app.logger.info('Appointment confirmation sent to %s for %s with %s on %s',
+                        appointment.user.email, appointment.child_name,
+                        appointment.doctor.name, appointment.appointment_date)
+
+@job_handler('send_appointment_reminder')
+def send_appointment_reminder(appointment_id):
+    appointment = Appointment.query.get(appointment_id)
+    if appointment and appointment.status in ('pending', 'confirmed'):
+        app.logger.info('Appointment reminder sent to %s for %s on %s',
+                        appointment.user.email, appointment.child_name,
+                        appointment.appointment_date)
+
+@app.cli.command('worker')
+@click.option('--batch-size', default=10, help='Jobs leased per poll')
+@click.option('--poll-interval', default=1.0, help='Seconds to sleep when the queue is empty')
+@click.option('--once', is_flag=True, help='Exit once no jobs are due')
+def worker_command(batch_size, poll_interval, once):
+    """Run the background job worker"""
+    run_worker(batch_size=batch_size, poll_interval=poll_interval, once=once)
+
+# Admission control
+# Every request is put in a route class. Critical pages (emergency info, the
+# home page banner, static files) skip admission entirely; everything else
+# takes a token from per-client and per-class buckets shared by all worker
+# processes, and expensive writes also need one of a few per-process slots so
+# they can never occupy every worker thread.
+# Per-client buckets are keyed on the client address. Behind a reverse proxy,
+# set HOSP_TRUSTED_PROXY_HOPS to the number of proxies so the address is taken
+# from X-Forwarded-For; otherwise every visitor shares the proxy's bucket.
+RATE_LIMITS = {  # route class: (burst capacity, tokens refilled per second)
+    'auth': (10, 10 / 60),
+    'booking': (5, 5 / 60),
+    'api': (60, 1.0),
+    'default': (120, 2.0),
+}
+ROUTE_CLASS_LIMITS = {  # limits shared by all clients of a route class
+    'auth': (200, 50.0),
+    'booking': (100, 20.0),
+}
+WRITE_CONCURRENCY = {'auth': 4, 'booking': 4}
+WRITE_SLOT_TIMEOUT = 0.5  # seconds a write request may wait for a slot
+BUCKET_CLEANUP_INTERVAL = 60  # seconds between sweeps of idle buckets, per process
+
+class TokenBucketStore:
+    """Token buckets kept in a small SQLite file so every worker process sees the same state"""
+    
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._max_refill = 0.0
+        self._next_cleanup = 0.0
+    
+    def _connection(self):
+        # One connection per thread, reopened after fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=0.05, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            conn.execute('CREATE TABLE IF NOT EXISTS bucket (key TEXT PRIMARY KEY, tokens REAL, updated REAL)')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+    
+    def take(self, *buckets):
+        """Take one token from each (key, capacity, rate) bucket, or from none of them;
+        returns (allowed, seconds until every bucket has a token)"""
+        now = time.time()
+        try:
+            conn = self._connection()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                levels = []
+                for key, capacity, rate in buckets:
+                    row = conn.execute('SELECT tokens, updated FROM bucket WHERE key = ?', (key,)).fetchone()
+                    tokens = capacity if row is None else min(capacity, row[0] + (now - row[1]) * rate)
+                    levels.append((key, tokens, rate))
+                allowed = all(tokens >= 1 for _, tokens, _ in levels)
+                # A rejected request spends nothing, so a shared-bucket overload
+                # does not also drain the client's own bucket
+                conn.executemany('INSERT OR REPLACE INTO bucket (key, tokens, updated) VALUES (?, ?, ?)',
+                                 [(key, tokens - 1 if allowed else tokens, now) for key, tokens, _ in levels])
+                self._max_refill = max([self._max_refill] + [capacity / rate for _, capacity, rate in buckets])
+                if now >= self._next_cleanup:
+                    self._next_cleanup = now + BUCKET_CLEANUP_INTERVAL
+                    # A bucket idle for a full refill is at capacity, the same as having no row
+                    conn.execute('DELETE FROM bucket WHERE updated < ?', (now - self._max_refill,))
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        except sqlite3.OperationalError:
+            # A contended or unavailable limiter must not take the site down with it
+            return True, 0
+        if allowed:
+            return True, 0
+        return False, max((1 - tokens) / rate for _, tokens, rate in levels if tokens < 1)
+
+rate_limit_store = TokenBucketStore(app.config['RATELIMIT_DB'])
+write_slots = {route_class: threading.BoundedSemaphore(limit) for route_class, limit in WRITE_CONCURRENCY.items()}
+
+def route_class_for_request():
+    """Classify the current request for admission control"""
+    if request.path in ('/', '/emergency', '/favicon.ico') or request.endpoint == 'static':
+        return 'critical'
+    if request.method == 'POST' and request.endpoint in ('login', 'register'):
+        return 'auth'
+    if request.method == 'POST' and request.endpoint == 'book_appointment':
+        return 'booking'
+    if request.path.startswith('/api/'):
+        return 'api'
+    return 'default'
+
+def overloaded_response(status_code, retry_after):
+    message = 'Too many requests, please try again shortly' if status_code == 429 else 'Service busy, please try again shortly'
+    if request.path.startswith('/api/'):
+        response = jsonify({'error': message})
+    else:
+        response = app.make_response(message)
+    response.status_code = status_code
+    response.headers['Retry-After'] = str(max(1, int(retry_after + 0.999)))
+    return response
+
+@app.before_request
+def admit_request():
+    """Rate-limit and bound concurrency before any view work is done"""
+    if not app.config['ADMISSION_CONTROL']:
+        return None
+    route_class = route_class_for_request()
+    if route_class == 'critical':
+        return None
+    
+    # remote_addr is the forwarded client address when TRUSTED_PROXY_HOPS is set
+    buckets = [(f'{route_class}:{request.remote_addr}', *RATE_LIMITS[route_class])]
+    if route_class in ROUTE_CLASS_LIMITS:
+        buckets.append((f'{route_class}:*', *ROUTE_CLASS_LIMITS[route_class]))
+    allowed, retry_after = rate_limit_store.take(*buckets)
+    if not allowed:
+        return overloaded_response(429, retry_after)
+    
+    slot = write_slots.get(route_class)
+    if slot is not None:
+        if not slot.acquire(timeout=WRITE_SLOT_TIMEOUT):
+            return overloaded_response(503, 1)
+        g.write_slot = slot
+    return None
+
+@app.teardown_request
+def release_write_slot(exc):
+    slot = g.pop('write_slot', None)
+    if slot is not None:
+        slot.release()
 
 # Routes
 @app.route('/')
@@ -257,7 +856,7 @@ def index():
     departments = Department.query.all()
     
     # Get statistics
-    total_doctors = sum(dept.doctors_count for dept in departments)
+    total_doctors = get_counter('doctors')
     total_departments = len(departments)
     
     return render_template('index.html', 
@@ -288,6 +887,8 @@ def register():
         new_user = User(username=username, email=email, password=hashed_password)
         
         db.session.add(new_user)
+        db.session.flush()
+        enqueue_job('send_welcome_message', {'user_id': new_user.id})
         db.session.commit()
         
         flash('Registration successful! Please login.', 'success')
@@ -330,7 +931,11 @@ def dashboard():
         return redirect(url_for('login'))
     
     user = User.query.get(session['user_id'])
-    appointments = Appointment.query.filter_by(user_id=user.id).order_by(Appointment.appointment_date.desc()).limit(5).all()
+    appointments = Appointment.query.filter_by(user_id=user.id).order_by(Appointment.appointment_date.desc(), Appointment.id.desc()).limit(5).all()
+    appointments = merge_with_archive(
+        user.id, appointments, 5,
+        lambda: ArchivedAppointment.query.filter_by(user_id=user.id).order_by(ArchivedAppointment.appointment_date.desc(), ArchivedAppointment.id.desc()).limit(5).all(),
+        key=lambda a: (a.appointment_date, a.id))
     records = MedicalRecord.query.filter_by(user_id=user.id).order_by(MedicalRecord.date.desc()).limit(5).all()
     
     return render_template('dashboard.html', 
@@ -342,7 +947,8 @@ def dashboard():
 def departments():
     """All departments page"""
     departments = Department.query.all()
-    return render_template('departments.html', departments=departments)
+    return render_template('departments.html', departments=departments,
+                           doctor_counts=department_doctor_counts())
 
 @app.route('/department/<int:dept_id>')
 def department_detail(dept_id):
@@ -391,6 +997,11 @@ def book_appointment():
         )
         
         db.session.add(appointment)
+        db.session.flush()
+        enqueue_job('send_appointment_confirmation', {'appointment_id': appointment.id})
+        reminder_at = local_to_utc(appointment.appointment_date) - timedelta(hours=24)
+        if reminder_at > datetime.utcnow():
+            enqueue_job('send_appointment_reminder', {'appointment_id': appointment.id}, run_at=reminder_at)
         db.session.commit()
         
         flash('Appointment booked successfully!', 'success')
@@ -423,61 +1034,804 @@ def emergency():
     """Emergency information page"""
     return render_template('emergency.html')
 
+# Doctor photos
+# Doctor.photo_url is a path under the static folder. Variants are rendered
+# in a process pool, stored on disk as <source hash>-<size>.<ext>, and served
+# from versioned URLs so browsers can cache them indefinitely.
+PHOTO_SIZES = {'thumbnail': 64, 'card': 240, 'profile': 480}
+PHOTO_FORMATS = {  # extension: (Pillow format, mimetype)
+    'webp': ('WEBP', 'image/webp'),
+    'jpg': ('JPEG', 'image/jpeg'),
+}
+PHOTO_POOL_WORKERS = 2
+PHOTO_MAX_AGE = 365 * 24 * 3600
+
+_photo_pool = None
+_photo_pool_pid = None
+_source_digests = {}  # (path, mtime, size) -> sha256 of the file
+
+def photo_pool():
+    """Process pool for image rendering, created lazily in each worker process"""
+    global _photo_pool, _photo_pool_pid
+    if _photo_pool is None or _photo_pool_pid != os.getpid():
+        # Forking this multi-threaded worker would copy its app, database and
+        # logging state (and any locks held); start renderers from a clean process
+        if 'forkserver' in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context('forkserver')
+            context.set_forkserver_preload(['photos'])
+        else:
+            context = multiprocessing.get_context('spawn')
+        _photo_pool = ProcessPoolExecutor(max_workers=PHOTO_POOL_WORKERS, mp_context=context)
+        _photo_pool_pid = os.getpid()
+    return _photo_pool
+
+def shutdown_photo_pool():
+    """Stop this process's renderers; call before a worker process exits"""
+    global _photo_pool
+    if _photo_pool is not None and _photo_pool_pid == os.getpid():
+        _photo_pool.shutdown(cancel_futures=True)
+    _photo_pool = None
+
+def _file_digest(path):
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    if key not in _source_digests:
+        with open(path, 'rb') as f:
+            _source_digests[key] = hashlib.file_digest(f, 'sha256').hexdigest()
+    return _source_digests[key]
+
+def doctor_photo_source(doctor):
+    """Local source image for a doctor, falling back to a generated placeholder avatar"""
+    if doctor.photo_url and app.static_folder:
+        static_root = os.path.realpath(app.static_folder)
+        path = os.path.realpath(os.path.join(static_root, doctor.photo_url.lstrip('/').removeprefix('static/')))
+        if path.startswith(static_root + os.sep) and os.path.isfile(path):
+            return path
+    
+    cache_dir = app.config['PHOTO_CACHE_DIR']
+    name_hash = hashlib.sha256(doctor.name.encode('utf-8')).hexdigest()[:16]
+    placeholder = os.path.join(cache_dir, f'placeholder-{name_hash}.png')
+    if not os.path.exists(placeholder):
+        os.makedirs(cache_dir, exist_ok=True)
+        photos.create_placeholder_avatar(doctor.name, placeholder)
+    return placeholder
+
+def doctor_photo_variant(doctor, size_name, extension, wait=True):
+    """Path of a cached photo variant, rendering it in the pool if missing"""
+    source = doctor_photo_source(doctor)
+    dest = os.path.join(app.config['PHOTO_CACHE_DIR'], f'{_file_digest(source)}-{size_name}.{extension}')
+    if os.path.exists(dest):
+        return dest
+    future = photo_pool().submit(photos.render_variant, source, PHOTO_SIZES[size_name],
+                                 PHOTO_FORMATS[extension][0], dest)
+    return future.result() if wait else future
+
+@app.template_global()
+def doctor_photo_url(doctor, size_name='card'):
+    """Versioned photo URL for templates; the version changes whenever the source does"""
+    version = _file_digest(doctor_photo_source(doctor))[:12]
+    return url_for('doctor_photo', doctor_id=doctor.id, size_name=size_name, v=version)
+
+def warm_photo_cache():
+    """Render every missing variant for every doctor"""
+    with app.app_context():
+        futures = []
+        for doctor in Doctor.query.all():
+            for size_name in PHOTO_SIZES:
+                for extension in PHOTO_FORMATS:
+                    futures.append(doctor_photo_variant(doctor, size_name, extension, wait=False))
+        for future in futures:
+            if not isinstance(future, str):
+                future.result()
+        return len(futures)
+
+@app.route('/doctors/<int:doctor_id>/photo/<size_name>')
+def doctor_photo(doctor_id, size_name):
+    """Resized doctor photo, WebP when the browser accepts it"""
+    if size_name not in PHOTO_SIZES:
+        abort(404)
+    doctor = Doctor.query.get_or_404(doctor_id)
+    extension = 'webp' if 'image/webp' in request.headers.get('Accept', '') else 'jpg'
+    
+    response = send_file(doctor_photo_variant(doctor, size_name, extension),
+                         mimetype=PHOTO_FORMATS[extension][1],
+                         max_age=PHOTO_MAX_AGE if 'v' in request.args else 300)
+    response.vary.add('Accept')
+    response.cache_control.public = True
+    if 'v' in request.args:
+        response.cache_control.immutable = True
+    return response
+
+@app.cli.command('warm-photos')
+def warm_photos_command():
+    """Pre-render all doctor photo variants"""
+    print(f"{warm_photo_cache()} photo variants ready")
+
+# API schemas
+# Each API resource declares its fields once as (output name, SQL expression).
+# The same declaration selects exactly those columns and zips the resulting
+# tuples into dicts, so no ORM entities are built for API responses.
+ApiField = namedtuple('ApiField', ['name', 'column'])
+API_DATE_FORMAT = '%Y-%m-%d %H:%M'
+API_MIMETYPES = ['application/json', 'application/msgpack', 'application/x-msgpack']
+
+class ApiSchema:
+    """Field declarations for one API resource"""
+    
+    def __init__(self, *fields, joins=()):
+        self.keys = tuple(field.name for field in fields)
+        self.columns = [field.column.label(field.name) for field in fields]
+        self.joins = joins
+    
+    def select(self, *extra_columns):
+        """SELECT of the declared fields; extra columns are appended after them"""
+        stmt = db.select(*self.columns, *extra_columns)
+        for target, onclause in self.joins:
+            stmt = stmt.join(target, onclause)
+        return stmt
+    
+    def fetch(self, stmt):
+        """Run a statement built from select() and return JSON-ready dicts"""
+        keys = self.keys
+        return [dict(zip(keys, row)) for row in db.session.connection().execute(stmt)]
+    
+    def fetch_grouped(self, stmt):
+        """Like fetch(), grouping dicts by the single extra column passed to select()"""
+        keys = self.keys
+        groups = {}
+        for row in db.session.connection().execute(stmt):
+            groups.setdefault(row[-1], []).append(dict(zip(keys, row)))
+        return groups
+
+DEPARTMENT_SCHEMA = ApiSchema(
+    ApiField('id', Department.id),
+    ApiField('name', Department.name),
+    ApiField('description', Department.description),
+    # Live count from the counters table rather than the hand-seeded column
+    ApiField('doctors_count', db.func.coalesce(
+        db.select(StatCounter.value).where(
+            StatCounter.metric == 'doctors', StatCounter.department_id == Department.id,
+            StatCounter.doctor_id == 0, StatCounter.day == '', StatCounter.status == ''
+        ).scalar_subquery(), 0)),
+    ApiField('contact_ext', Department.contact_ext),
+)
+
+DOCTOR_SCHEMA = ApiSchema(
+    ApiField('id', Doctor.id),
+    ApiField('name', Doctor.name),
+    ApiField('specialization', Doctor.specialization),
+    ApiField('experience', Doctor.experience),
+    ApiField('qualification', Doctor.qualification),
+)
+
+def appointment_schema(model):
+    """Appointment fields for the hot table or the archive"""
+    return ApiSchema(
+        ApiField('id', model.id),
+        ApiField('child_name', model.child_name),
+        ApiField('doctor_name', Doctor.name),
+        ApiField('department', Department.name),
+        # Formatted by SQLite, so rows never become datetime objects
+        ApiField('date', db.func.strftime(API_DATE_FORMAT, model.appointment_date)),
+        ApiField('status', model.status),
+        joins=[
+            (Doctor, Doctor.id == model.doctor_id),
+            (Department, Department.id == model.department_id),
+        ]
+    )
+
+APPOINTMENT_SCHEMA = appointment_schema(Appointment)
+ARCHIVED_APPOINTMENT_SCHEMA = appointment_schema(ArchivedAppointment)
+
+def api_response(data, status=200):
+    """Serialize API data as JSON, or MessagePack when the client asks for it"""
+    best = request.accept_mimetypes.best_match(API_MIMETYPES, default='application/json')
+    if msgpack is not None and best != 'application/json':
+        response = app.response_class(msgpack.packb(data), status=status, mimetype='application/msgpack')
+    else:
+        response = app.response_class(json.dumps(data, separators=(',', ':')), status=status, mimetype='application/json')
+    response.vary.add('Accept')
+    return response
+
 # API endpoints
+def department_rows():
+    return DEPARTMENT_SCHEMA.fetch(DEPARTMENT_SCHEMA.select().order_by(Department.id))
+
+def doctor_rows_by_department(dept_ids):
+    """Doctors for several departments with one IN query, keyed by department id"""
+    stmt = DOCTOR_SCHEMA.select(Doctor.department_id) \
+        .where(Doctor.department_id.in_(dept_ids)).order_by(Doctor.id)
+    return DOCTOR_SCHEMA.fetch_grouped(stmt)
+
+def appointment_rows(user_id, limit=None, before=None):
+    """Newest-first page of a user's appointments, hot and archived; returns (rows, next cursor)"""
+    limit = max(1, min(int(limit or API_HISTORY_PAGE_SIZE), API_HISTORY_MAX_PAGE_SIZE))
+    if before:
+        value, last_id = before.rsplit('|', 1)
+        before = (datetime.fromisoformat(value), int(last_id))
+    
+    def fetch(model, schema):
+        stmt = schema.select(model.appointment_date, model.id).where(model.user_id == user_id)
+        if before:
+            stmt = stmt.where(db.tuple_(model.appointment_date, model.id) < db.tuple_(*before))
+        stmt = stmt.order_by(model.appointment_date.desc(), model.id.desc()).limit(limit)
+        keys = schema.keys
+        return [(row[-2], row[-1], dict(zip(keys, row))) for row in db.session.connection().execute(stmt)]
+    
+    rows = merge_with_archive(user_id, fetch(Appointment, APPOINTMENT_SCHEMA), limit,
+                              lambda: fetch(ArchivedAppointment, ARCHIVED_APPOINTMENT_SCHEMA),
+                              key=lambda row: row[:2])
+    next_cursor = f'{rows[-1][0].isoformat()}|{rows[-1][1]}' if len(rows) == limit else None
+    return [row[2] for row in rows], next_cursor
+
 @app.route('/api/departments')
 def api_departments():
     """API endpoint for departments"""
-    departments = Department.query.all()
-    result = []
-    
-    for dept in departments:
-        result.append({
-            'id': dept.id,
-            'name': dept.name,
-            'description': dept.description,
-            'doctors_count': dept.doctors_count,
-            'contact_ext': dept.contact_ext
-        })
-    
-    return jsonify(result)
+    return api_response(department_rows())
 
 @app.route('/api/doctors/<int:dept_id>')
 def api_doctors_by_department(dept_id):
     """API endpoint for doctors by department"""
-    doctors = Doctor.query.filter_by(department_id=dept_id).all()
-    result = []
-    
-    for doctor in doctors:
-        result.append({
-            'id': doctor.id,
-            'name': doctor.name,
-            'specialization': doctor.specialization,
-            'experience': doctor.experience,
-            'qualification': doctor.qualification
-        })
-    
-    return jsonify(result)
+    return api_response(doctor_rows_by_department([dept_id]).get(dept_id, []))
 
 @app.route('/api/appointments')
 def api_appointments():
     """API endpoint for user's appointments"""
     if 'user_id' not in session:
-        return jsonify({'error': 'Not authenticated'}), 401
+        return api_response({'error': 'Not authenticated'}, 401)
+    
+    try:
+        rows, next_cursor = appointment_rows(session['user_id'], request.args.get('limit'), request.args.get('before'))
+    except ValueError:
+        return api_response({'error': 'Invalid limit or cursor'}, 400)
     
-    appointments = Appointment.query.filter_by(user_id=session['user_id']).all()
-    result = []
+    response = api_response(rows)
+    if next_cursor:
+        response.headers['Link'] = f'<{url_for("api_appointments", limit=len(rows), before=next_cursor)}>; rel="next"'
+    return response
+
+API_BATCH_MAX_REQUESTS = 50
+
+@app.route('/api/batch', methods=['POST'])
+def api_batch():
+    """Run several GET API requests in one round-trip
+
+    Body: {"requests": [{"id": "depts", "path": "/api/departments"},
+                        {"id": "cardio", "path": "/api/doctors/3"},
+                        {"id": "history", "path": "/api/appointments?limit=200"}, ...]}
+    Response: {"responses": [{"id": "depts", "status": 200, "body": [...]}, ...,
+                             {"id": "history", "status": 200, "body": [...], "next_cursor": "..."}]}
+    """
+    data = request.get_json(silent=True)
+    subrequests = data.get('requests') if isinstance(data, dict) else None
+    if not isinstance(subrequests, list) or not all(isinstance(sub, dict) for sub in subrequests):
+        return api_response({'error': 'Expected {"requests": [{"id": ..., "path": ...}, ...]}'}, 400)
+    if len(subrequests) > API_BATCH_MAX_REQUESTS:
+        return api_response({'error': f'At most {API_BATCH_MAX_REQUESTS} requests per batch'}, 400)
     
-    for appt in appointments:
-        result.append({
-            'id': appt.id,
-            'child_name': appt.child_name,
-            'doctor_name': appt.doctor.name,
-            'department': appt.department.name,
-            'date': appt.appointment_date.strftime('%Y-%m-%d %H:%M'),
-            'status': appt.status
-        })
+    # Route every sub-request first so doctor lookups can be combined
+    adapter = app.url_map.bind_to_environ(request.environ)
+    routed = []
+    for sub in subrequests:
+        url = urlsplit(str(sub.get('path', '')))
+        try:
+            routed.append((*adapter.match(url.path, method='GET'), dict(parse_qsl(url.query))))
+        except HTTPException as e:
+            routed.append((None, e, {}))
     
-    return jsonify(result)
+    dept_ids = {args['dept_id'] for endpoint, args, _ in routed if endpoint == 'api_doctors_by_department'}
+    doctors = doctor_rows_by_department(dept_ids) if dept_ids else {}
+    user_id = session.get('user_id')
+    cache = {}
+    
+    responses = []
+    for sub, (endpoint, args, query) in zip(subrequests, routed):
+        extra = {}
+        if endpoint is None:
+            status, body = args.code, {'error': args.name}
+        elif endpoint == 'api_departments':
+            if 'departments' not in cache:
+                cache['departments'] = department_rows()
+            status, body = 200, cache['departments']
+        elif endpoint == 'api_doctors_by_department':
+            status, body = 200, doctors.get(args['dept_id'], [])
+        elif endpoint == 'api_appointments':
+            if user_id is None:
+                status, body = 401, {'error': 'Not authenticated'}
+            else:
+                page = ('appointments', query.get('limit'), query.get('before'))
+                try:
+                    if page not in cache:
+                        cache[page] = appointment_rows(user_id, page[1], page[2])
+                    status, (body, extra['next_cursor']) = 200, cache[page]
+                except ValueError:
+                    status, body = 400, {'error': 'Invalid limit or cursor'}
+        else:
+            status, body = 400, {'error': 'Path not supported in batch requests'}
+        responses.append({'id': sub.get('id'), 'status': status, 'body': body, **extra})
+    
+    return api_response({'responses': responses})
+
+# Appointment archive
+# Finished appointments older than ARCHIVE_AFTER_DAYS are moved to
+# archived_appointment in small batches, keeping the hot table (and its
+# indexes) proportional to current activity.
+ARCHIVE_STATUSES = ('completed', 'cancelled')
+ARCHIVE_BATCH_SIZE = 500
+ARCHIVE_BATCH_PAUSE = 0.05  # seconds between batches so other writers get the lock
+API_HISTORY_PAGE_SIZE = 50
+API_HISTORY_MAX_PAGE_SIZE = 200
+
+def archive_appointments(days=None, batch_size=ARCHIVE_BATCH_SIZE, pause=ARCHIVE_BATCH_PAUSE):
+    """Move old completed/cancelled appointments to the archive; returns the number moved"""
+    days = app.config['ARCHIVE_AFTER_DAYS'] if days is None else days
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    columns = [column.name for column in Appointment.__table__.columns]
+    moved = 0
+    
+    while True:
+        batch_ids = db.select(Appointment.id).where(
+            Appointment.status.in_(ARCHIVE_STATUSES), Appointment.appointment_date < cutoff
+        ).order_by(Appointment.id).limit(batch_size)
+        ids = db.session.execute(batch_ids).scalars().all()
+        if not ids:
+            break
+        
+        # Conditions are re-checked under the write lock the INSERT takes
+        selection = [Appointment.id.in_(ids), Appointment.status.in_(ARCHIVE_STATUSES),
+                     Appointment.appointment_date < cutoff]
+        db.session.execute(db.insert(ArchivedAppointment.__table__).from_select(
+            columns + ['archived_at'],
+            db.select(*Appointment.__table__.columns, db.literal(datetime.utcnow())).where(*selection)
+        ))
+        result = db.session.execute(db.delete(Appointment.__table__).where(*selection))
+        db.session.commit()
+        moved += result.rowcount
+        time.sleep(pause)
+    return moved
+
+def merge_with_archive(user_id, hot_rows, limit, fetch_archived, key):
+    """Complete a newest-first page of hot rows with archived rows that belong on it"""
+    newest_archived = db.session.query(db.func.max(ArchivedAppointment.appointment_date)) \
+        .filter(ArchivedAppointment.user_id == user_id).scalar()
+    # A full page that ends after the newest archived appointment cannot contain archived rows
+    if newest_archived is None or (len(hot_rows) == limit and key(hot_rows[-1])[0] > newest_archived):
+        return hot_rows
+    return sorted(hot_rows + fetch_archived(), key=key, reverse=True)[:limit]
+
+@app.cli.command('archive-appointments')
+@click.option('--days', type=int, default=None, help='Archive appointments older than this (default ARCHIVE_AFTER_DAYS)')
+@click.option('--batch-size', default=ARCHIVE_BATCH_SIZE, help='Rows moved per transaction')
+def archive_appointments_command(days, batch_size):
+    """Move old completed and cancelled appointments to the archive"""
+    print(f"{archive_appointments(days, batch_size)} appointments archived")
+
+# Admin console
+APPOINTMENT_STATUSES = ('pending', 'confirmed', 'completed', 'cancelled')
+ADMIN_SORT_COLUMNS = {
+    'appointment_date': Appointment.appointment_date,
+    'created_at': Appointment.created_at,
+}
+ADMIN_PAGE_SIZE = 50
+ADMIN_MAX_PAGE_SIZE = 200
+ADMIN_MAX_BULK_IDS = 1000
+
+def admin_required(view):
+    """Restrict a view to logged-in administrators"""
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        if not session.get('is_admin'):
+            if request.path.startswith('/api/'):
+                return jsonify({'error': 'Admin access required'}), 403
+            flash('Admin access required', 'error')
+            return redirect(url_for('login'))
+        return view(*args, **kwargs)
+    return wrapped
+
+def begin_write_transaction():
+    """Take SQLite's write lock now so later reads in this transaction cannot go stale"""
+    # pysqlite only opens a transaction on the first DML statement, so a no-op
+    # UPDATE is the portable way to get the equivalent of BEGIN IMMEDIATE.
+    db.session.execute(db.update(StatCounter.__table__).where(db.false()).values(value=StatCounter.value))
+
+def admin_appointment_conditions(filters):
+    """Translate department/doctor/status/date filters into SQL conditions"""
+    conditions = []
+    if filters.get('department_id'):
+        conditions.append(Appointment.department_id == int(filters['department_id']))
+    if filters.get('doctor_id'):
+        conditions.append(Appointment.doctor_id == int(filters['doctor_id']))
+    if filters.get('status'):
+        if filters['status'] not in APPOINTMENT_STATUSES:
+            raise ValueError(f"Invalid status: {filters['status']}")
+        conditions.append(Appointment.status == filters['status'])
+    if filters.get('date_from'):
+        conditions.append(Appointment.appointment_date >= datetime.strptime(filters['date_from'], '%Y-%m-%d'))
+    if filters.get('date_to'):
+        conditions.append(Appointment.appointment_date < datetime.strptime(filters['date_to'], '%Y-%m-%d') + timedelta(days=1))
+    return conditions
+
+def list_admin_appointments(args):
+    """One keyset-paginated page of appointments across all users"""
+    sort = args.get('sort', 'appointment_date')
+    if sort not in ADMIN_SORT_COLUMNS:
+        raise ValueError(f'Invalid sort: {sort}')
+    sort_column = ADMIN_SORT_COLUMNS[sort]
+    descending = args.get('order', 'desc') != 'asc'
+    limit = max(1, min(int(args.get('limit', ADMIN_PAGE_SIZE)), ADMIN_MAX_PAGE_SIZE))
+    
+    query = db.session.query(
+        Appointment.id, Appointment.child_name, Appointment.child_age,
+        Appointment.appointment_date, Appointment.status, Appointment.created_at,
+        Appointment.department_id, Appointment.doctor_id,
+        User.username, Doctor.name.label('doctor_name'), Department.name.label('department_name')
+    ).join(User, User.id == Appointment.user_id) \
+     .join(Doctor, Doctor.id == Appointment.doctor_id) \
+     .join(Department, Department.id == Appointment.department_id) \
+     .filter(*admin_appointment_conditions(args))
+    
+    if args.get('cursor'):
+        value, last_id = args['cursor'].rsplit('|', 1)
+        keyset = db.tuple_(sort_column, Appointment.id)
+        position = db.tuple_(datetime.fromisoformat(value), int(last_id))
+        query = query.filter(keyset < position if descending else keyset > position)
+    
+    if descending:
+        query = query.order_by(sort_column.desc(), Appointment.id.desc())
+    else:
+        query = query.order_by(sort_column.asc(), Appointment.id.asc())
+    
+    rows = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = f'{getattr(rows[-1], sort).isoformat()}|{rows[-1].id}'
+    return rows, next_cursor
+
+def bulk_update_appointment_status(new_status, ids=None, filters=None):
+    """Set the status of many appointments with one UPDATE, keeping counters in step"""
+    if new_status not in APPOINTMENT_STATUSES:
+        raise ValueError(f'Invalid status: {new_status}')
+    
+    if ids is not None and not isinstance(ids, (list, tuple)):
+        raise ValueError('ids must be a list of appointment ids')
+    if filters is not None and not isinstance(filters, dict):
+        raise ValueError('filter must be an object')
+    
+    conditions = [Appointment.status != new_status]
+    if ids:
+        if len(ids) > ADMIN_MAX_BULK_IDS:
+            raise ValueError(f'At most {ADMIN_MAX_BULK_IDS} ids per request')
+        try:
+            conditions.append(Appointment.id.in_([int(i) for i in ids]))
+        except TypeError:
+            raise ValueError('ids must be a list of appointment ids')
+    else:
+        try:
+            selection = admin_appointment_conditions(filters or {})
+        except TypeError:
+            raise ValueError('Invalid filter value')
+        if not selection:
+            raise ValueError('Pass appointment ids or at least one filter')
+        conditions.extend(selection)
+    
+    begin_write_transaction()
+    day = db.func.date(Appointment.appointment_date)
+    groups = db.session.query(
+        Appointment.department_id, Appointment.doctor_id, day, Appointment.status, db.func.count(Appointment.id)
+    ).filter(*conditions).group_by(Appointment.department_id, Appointment.doctor_id, day, Appointment.status).all()
+    
+    deltas = {}
+    for department_id, doctor_id, day_value, status, count in groups:
+        appointment_day = datetime.strptime(day_value, '%Y-%m-%d')
+        _add_keys(deltas, appointment_counter_keys(department_id, doctor_id, appointment_day, status), -count)
+        _add_keys(deltas, appointment_counter_keys(department_id, doctor_id, appointment_day, new_status), count)
+    apply_counter_deltas(db.session.connection(), deltas)
+    
+    db.session.execute(db.insert(AppointmentEvent.__table__).from_select(
+        ['appointment_id', 'user_id', 'status', 'created_at'],
+        db.select(Appointment.id, Appointment.user_id, db.literal(new_status), db.literal(datetime.utcnow()))
+        .where(*conditions)
+    ))
+    result = db.session.execute(
+        db.update(Appointment).where(*conditions).values(status=new_status)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return result.rowcount
+
+def admin_appointment_dict(row):
+    return {
+        'id': row.id,
+        'child_name': row.child_name,
+        'child_age': row.child_age,
+        'username': row.username,
+        'doctor_id': row.doctor_id,
+        'doctor_name': row.doctor_name,
+        'department_id': row.department_id,
+        'department': row.department_name,
+        'date': row.appointment_date.strftime('%Y-%m-%d %H:%M'),
+        'status': row.status,
+        'created_at': row.created_at.strftime('%Y-%m-%d %H:%M') if row.created_at else None
+    }
+
+@app.route('/admin/appointments')
+@admin_required
+def admin_appointments():
+    """Admin appointment console"""
+    try:
+        appointments, next_cursor = list_admin_appointments(request.args)
+    except ValueError as e:
+        flash(str(e), 'error')
+        appointments, next_cursor = [], None
+    
+    next_args = request.args.to_dict()
+    next_args['cursor'] = next_cursor
+    
+    return render_template('admin_appointments.html',
+                         appointments=appointments,
+                         next_url=url_for('admin_appointments', **next_args) if next_cursor else None,
+                         departments=Department.query.all(),
+                         doctors=Doctor.query.all(),
+                         statuses=APPOINTMENT_STATUSES,
+                         filters=request.args)
+
+@app.route('/admin/appointments/status', methods=['POST'])
+@admin_required
+def admin_update_appointment_status():
+    """Bulk status change from the admin console"""
+    try:
+        count = bulk_update_appointment_status(request.form.get('status'),
+                                               ids=request.form.getlist('appointment_ids'))
+        flash(f'{count} appointments updated', 'success')
+    except ValueError as e:
+        db.session.rollback()
+        flash(str(e), 'error')
+    return redirect(request.referrer or url_for('admin_appointments'))
+
+@app.route('/api/admin/appointments')
+@admin_required
+def api_admin_appointments():
+    """API endpoint for filtering appointments across all users"""
+    try:
+        appointments, next_cursor = list_admin_appointments(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({
+        'appointments': [admin_appointment_dict(row) for row in appointments],
+        'next_cursor': next_cursor
+    })
+
+@app.route('/api/admin/appointments/status', methods=['POST'])
+@admin_required
+def api_admin_update_appointment_status():
+    """API endpoint for bulk appointment status changes"""
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Request body must be a JSON object'}), 400
+    try:
+        count = bulk_update_appointment_status(data.get('status'), ids=data.get('ids'),
+                                               filters=data.get('filter'))
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({'updated': count})
+
+# Database snapshots
+# Snapshots use SQLite's online backup API a few pages at a time, so the
+# database stays available while they run. Each snapshot is verified,
+# gzipped and named after its content hash; a snapshot identical to the
+# previous one is not stored again.
+SNAPSHOT_PAGES_PER_STEP = 256
+SNAPSHOT_STEP_PAUSE = 0.005  # seconds between steps, giving writers a window
+SNAPSHOT_MAX_RESTARTS = 5
+SNAPSHOT_KEEP = 14
+SNAPSHOT_PREFIX = 'hospital-'
+
+class _SnapshotRestarting(Exception):
+    pass
+
+def database_path():
+    with app.app_context():
+        return db.engine.url.database
+
+def _verify_database(path):
+    conn = sqlite3.connect(path)
+    try:
+        result = conn.execute('PRAGMA integrity_check').fetchone()[0]
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    finally:
+        conn.close()
+    if result != 'ok':
+        raise ValueError(f'Integrity check failed: {result}')
+    missing = {'user', 'appointment', 'department', 'doctor'} - tables
+    if missing:
+        raise ValueError(f"Not a hospital database (missing tables: {', '.join(sorted(missing))})")
+
+def _sha256(path):
+    with open(path, 'rb') as f:
+        return hashlib.file_digest(f, 'sha256').hexdigest()
+
+class LatencyProbe:
+    """Times login- and dashboard-style queries from a separate connection"""
+    
+    def __init__(self, path, interval=0.005):
+        self.path = path
+        self.interval = interval
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def _probe_once(self, conn):
+        started = time.perf_counter()
+        conn.execute('SELECT id, password FROM user WHERE username = ?', ('admin',)).fetchall()
+        conn.execute('SELECT id FROM appointment WHERE user_id = ? ORDER BY appointment_date DESC LIMIT 5', (1,)).fetchall()
+        self.samples.append((time.perf_counter() - started) * 1000)
+    
+    def _run(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            while not self._stop.is_set():
+                self._probe_once(conn)
+                time.sleep(self.interval)
+        finally:
+            conn.close()
+    
+    def sample(self, seconds):
+        """Collect samples for a fixed time, e.g. as a baseline"""
+        self.start()
+        time.sleep(seconds)
+        return self.stop()
+    
+    def start(self):
+        self.samples = []
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        samples = sorted(self.samples)
+        if not samples:
+            return {'p50': 0.0, 'p99': 0.0, 'max': 0.0}
+        return {
+            'p50': samples[len(samples) // 2],
+            'p99': samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+            'max': samples[-1],
+        }
+
+def _online_backup(src_path, dest_path, pages=SNAPSHOT_PAGES_PER_STEP, pause=SNAPSHOT_STEP_PAUSE):
+    """Copy src to dest in page steps; returns (pages copied, restarts)"""
+    state = {'remaining': None, 'total': 0, 'restarts': 0}
+    
+    def progress(status, remaining, total):
+        # A write by another connection makes SQLite start the copy over
+        if state['remaining'] is not None and remaining > state['remaining']:
+            state['restarts'] += 1
+            if state['restarts'] > SNAPSHOT_MAX_RESTARTS:
+                raise _SnapshotRestarting()
+        state['remaining'] = remaining
+        state['total'] = total
+    
+    src = sqlite3.connect(src_path, timeout=30)
+    dest = sqlite3.connect(dest_path)
+    try:
+        try:
+            src.backup(dest, pages=pages, progress=progress, sleep=pause)
+        except _SnapshotRestarting:
+            # Under sustained writes, finish with one step: a single read transaction, which WAL lets writers run alongside
+            src.backup(dest, pages=-1)
+            state['total'] = dest.execute('PRAGMA page_count').fetchone()[0]
+    finally:
+        dest.close()
+        src.close()
+    return state['total'], state['restarts']
+
+def list_snapshots(snapshot_dir=None):
+    """Snapshot files, oldest first"""
+    snapshot_dir = snapshot_dir or app.config['SNAPSHOT_DIR']
+    if not os.path.isdir(snapshot_dir):
+        return []
+    names = sorted(n for n in os.listdir(snapshot_dir) if n.startswith(SNAPSHOT_PREFIX) and n.endswith('.db.gz'))
+    return [os.path.join(snapshot_dir, n) for n in names]
+
+def snapshot_database(snapshot_dir=None, keep=SNAPSHOT_KEEP, pages=SNAPSHOT_PAGES_PER_STEP, pause=SNAPSHOT_STEP_PAUSE):
+    """Take a verified, compressed snapshot and rotate old ones; returns a stats dict"""
+    snapshot_dir = snapshot_dir or app.config['SNAPSHOT_DIR']
+    os.makedirs(snapshot_dir, exist_ok=True)
+    src_path = database_path()
+    probe = LatencyProbe(src_path)
+    baseline = probe.sample(0.25)
+    
+    fd, tmp_path = tempfile.mkstemp(suffix='.db', dir=snapshot_dir)
+    os.close(fd)
+    try:
+        probe.start()
+        started = time.perf_counter()
+        page_count, restarts = _online_backup(src_path, tmp_path, pages, pause)
+        elapsed = time.perf_counter() - started
+        during = probe.stop()
+        
+        _verify_database(tmp_path)
+        digest = _sha256(tmp_path)
+        size = os.path.getsize(tmp_path)
+        stats = {
+            'pages': page_count, 'bytes': size, 'seconds': elapsed, 'restarts': restarts,
+            'mib_per_second': size / (1024 * 1024) / elapsed if elapsed else 0.0,
+            'baseline_ms': baseline, 'during_ms': during,
+        }
+        
+        existing = list_snapshots(snapshot_dir)
+        if existing and existing[-1].endswith(f'-{digest[:12]}.db.gz'):
+            stats.update(path=existing[-1], skipped=True)
+            return stats
+        
+        path = os.path.join(snapshot_dir, f"{SNAPSHOT_PREFIX}{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}-{digest[:12]}.db.gz")
+        with open(tmp_path, 'rb') as src, gzip.open(path + '.tmp', 'wb', compresslevel=6) as dest:
+            shutil.copyfileobj(src, dest)
+        os.replace(path + '.tmp', path)
+        stats.update(path=path, skipped=False, compressed_bytes=os.path.getsize(path))
+    finally:
+        os.remove(tmp_path)
+    
+    for old in list_snapshots(snapshot_dir)[:-keep] if keep else []:
+        os.remove(old)
+    return stats
+
+def restore_database(snapshot_path):
+    """Verify a snapshot, save the current database, then restore the snapshot online"""
+    live_path = database_path()
+    fd, tmp_path = tempfile.mkstemp(suffix='.db', dir=os.path.dirname(live_path))
+    os.close(fd)
+    try:
+        opener = gzip.open if snapshot_path.endswith('.gz') else open
+        with opener(snapshot_path, 'rb') as src, open(tmp_path, 'wb') as dest:
+            shutil.copyfileobj(src, dest)
+        _verify_database(tmp_path)
+        
+        safety = snapshot_database()
+        # One step, so other connections see either the old or the restored database, never a mix
+        _online_backup(tmp_path, live_path, pages=-1)
+        _verify_database(live_path)
+    finally:
+        os.remove(tmp_path)
+    with app.app_context():
+        db.engine.dispose()
+    return safety['path']
+
+def _print_snapshot_stats(stats):
+    if stats['skipped']:
+        print(f"Database unchanged since {os.path.basename(stats['path'])}; no new snapshot stored")
+    else:
+        print(f"Snapshot written to {stats['path']} "
+              f"({stats['bytes'] / (1024 * 1024):.1f} MiB, {stats['compressed_bytes'] / (1024 * 1024):.1f} MiB compressed)")
+    print(f"  {stats['pages']} pages in {stats['seconds']:.2f}s ({stats['mib_per_second']:.1f} MiB/s, {stats['restarts']} restarts)")
+    print("  query latency p50/p99/max: baseline {p50:.2f}/{p99:.2f}/{max:.2f} ms".format(**stats['baseline_ms'])
+          + ", during backup {p50:.2f}/{p99:.2f}/{max:.2f} ms".format(**stats['during_ms']))
+
+@app.cli.command('snapshot')
+@click.option('--keep', default=SNAPSHOT_KEEP, help='Snapshots to retain')
+@click.option('--every', type=float, default=None, help='Keep running and snapshot every N seconds')
+def snapshot_command(keep, every):
+    """Take an online snapshot of the database"""
+    while True:
+        _print_snapshot_stats(snapshot_database(keep=keep))
+        if every is None:
+            return
+        time.sleep(every)
+
+@app.cli.command('restore')
+@click.argument('snapshot_path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--yes', is_flag=True, help='Do not ask for confirmation')
+def restore_command(snapshot_path, yes):
+    """Restore the database from a snapshot"""
+    if not yes:
+        click.confirm(f'Replace the live database with {snapshot_path}?', abort=True)
+    safety_path = restore_database(snapshot_path)
+    print(f"Database restored from {snapshot_path}; previous state saved to {safety_path}")
 
 # Error handlers
 @app.errorhandler(404)
@@ -608,6 +1962,9 @@ def create_templates():
                         <li class="nav-item"><a class="nav-link" href="/pharmacy">Pharmacy</a></li>
                         {% if 'user_id' in session %}
                             <li class="nav-item"><a class="nav-link" href="/dashboard">Dashboard</a></li>
+                            {% if session.is_admin %}
+                                <li class="nav-item"><a class="nav-link" href="/admin/appointments">Admin</a></li>
+                            {% endif %}
                             <li class="nav-item"><a class="nav-link" href="/logout">Logout ({{ session.username }})</a></li>
                         {% else %}
                             <li class="nav-item"><a class="nav-link" href="/login">Login</a></li>
@@ -794,7 +2151,7 @@ def create_templates():
                                 <h4>{{ department.name }}</h4>
                                 <p>{{ department.description }}</p>
                                 <div class="d-flex justify-content-between align-items-center">
-                                    <span class="badge bg-primary">{{ department.doctors_count }} Doctors</span>
+                                    <span class="badge bg-primary">{{ doctor_counts.get(department.id, 0) }} Doctors</span>
                                     <div>
                                         <span class="me-3">Ext: {{ department.contact_ext }}</span>
                                         <a href="/department/{{ department.id }}" class="btn btn-primary btn-sm">View Details</a>
@@ -811,11 +2168,105 @@ def create_templates():
     {% endblock %}
     '''
     
+    # Admin appointment console template
+    admin_appointments_template = '''
+    {% extends "base.html" %}
+    {% block title %}Admin - Appointments{% endblock %}
+    {% block content %}
+    <div class="container py-5">
+        <h1 class="mb-4">Appointments</h1>
+        
+        <!-- Filters -->
+        <form method="get" class="row g-2 mb-4">
+            <div class="col-md-2">
+                <select name="department_id" class="form-select">
+                    <option value="">All departments</option>
+                    {% for department in departments %}
+                    <option value="{{ department.id }}" {% if filters.department_id == department.id|string %}selected{% endif %}>{{ department.name }}</option>
+                    {% endfor %}
+                </select>
+            </div>
+            <div class="col-md-2">
+                <select name="doctor_id" class="form-select">
+                    <option value="">All doctors</option>
+                    {% for doctor in doctors %}
+                    <option value="{{ doctor.id }}" {% if filters.doctor_id == doctor.id|string %}selected{% endif %}>{{ doctor.name }}</option>
+                    {% endfor %}
+                </select>
+            </div>
+            <div class="col-md-2">
+                <select name="status" class="form-select">
+                    <option value="">All statuses</option>
+                    {% for status in statuses %}
+                    <option value="{{ status }}" {% if filters.status == status %}selected{% endif %}>{{ status|capitalize }}</option>
+                    {% endfor %}
+                </select>
+            </div>
+            <div class="col-md-2"><input type="date" name="date_from" value="{{ filters.date_from }}" class="form-control"></div>
+            <div class="col-md-2"><input type="date" name="date_to" value="{{ filters.date_to }}" class="form-control"></div>
+            <div class="col-md-1">
+                <select name="order" class="form-select">
+                    <option value="desc">Newest</option>
+                    <option value="asc" {% if filters.order == 'asc' %}selected{% endif %}>Oldest</option>
+                </select>
+            </div>
+            <div class="col-md-1"><button type="submit" class="btn btn-primary w-100">Filter</button></div>
+        </form>
+        
+        <!-- Results with bulk status change -->
+        <form method="post" action="/admin/appointments/status">
+            <table class="table table-hover bg-white">
+                <thead>
+                    <tr>
+                        <th></th>
+                        <th>Date</th>
+                        <th>Child</th>
+                        <th>Parent</th>
+                        <th>Doctor</th>
+                        <th>Department</th>
+                        <th>Status</th>
+                    </tr>
+                </thead>
+                <tbody>
+                    {% for appointment in appointments %}
+                    <tr>
+                        <td><input type="checkbox" name="appointment_ids" value="{{ appointment.id }}" class="form-check-input"></td>
+                        <td>{{ appointment.appointment_date.strftime('%Y-%m-%d %H:%M') }}</td>
+                        <td>{{ appointment.child_name }} ({{ appointment.child_age }})</td>
+                        <td>{{ appointment.username }}</td>
+                        <td>{{ appointment.doctor_name }}</td>
+                        <td>{{ appointment.department_name }}</td>
+                        <td><span class="badge bg-secondary">{{ appointment.status }}</span></td>
+                    </tr>
+                    {% else %}
+                    <tr><td colspan="7" class="text-center text-muted">No appointments found</td></tr>
+                    {% endfor %}
+                </tbody>
+            </table>
+            <div class="d-flex justify-content-between">
+                <div class="d-flex">
+                    <select name="status" class="form-select me-2">
+                        {% for status in statuses %}
+                        <option value="{{ status }}">{{ status|capitalize }}</option>
+                        {% endfor %}
+                    </select>
+                    <button type="submit" class="btn btn-warning text-nowrap">Update selected</button>
+                </div>
+                {% if next_url %}
+                <a href="{{ next_url }}" class="btn btn-outline-primary">Next page</a>
+                {% endif %}
+            </div>
+        </form>
+    </div>
+    {% endblock %}
+    '''
+    
     # Write templates to files
     templates = {
         'base.html': base_template,
         'index.html': index_template,
         'departments.html': departments_template,
+        'admin_appointments.html': admin_appointments_template,
         # Add more templates as needed...
     }
     
@@ -823,13 +2274,41 @@ def create_templates():
         with open(os.path.join(templates_dir, filename), 'w') as f:
             f.write(content)
 
-# Run the application
-if __name__ == '__main__':
-    # Create templates directory
+def create_admin_user():
+    """Create the default admin account if it does not exist"""
+    with app.app_context():
+        if not User.query.filter_by(username='admin').first():
+            admin = User(
+                username='admin',
+                email='admin@hospital.org',
+                password=generate_password_hash('admin123'),
+                is_admin=True
+            )
+            db.session.add(admin)
+            db.session.commit()
+            print("Admin user created: admin / admin123")
+
+def setup_application():
+    """One-time setup: templates, sample data and the admin account"""
     create_templates()
-    
-    # Initialize database with sample data
     initialize_data()
+    create_admin_user()
+
+def warm_up():
+    """Load everything a first request would otherwise pay for"""
+    create_hospital_logo()
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+    with app.app_context():
+        Department.query.all()
+        Doctor.query.all()
+        # Forked workers must open their own connections
+        db.engine.dispose()
+
+# Run the application
+if __name__ == '__main__':
+    # Create templates, sample data and the admin account
+    setup_application()
     
     # Generate hospital logo
     logo = create_hospital_logo()
@@ -851,17 +2330,4 @@ if __name__ == '__main__':
     print("\nAdmin account: admin / admin123")
     print("="*50)
     
-    # Create admin user
-    with app.app_context():
-        if not User.query.filter_by(username='admin').first():
-            admin = User(
-                username='admin',
-                email='admin@hospital.org',
-                password=generate_password_hash('admin123'),
-                is_admin=True
-            )
-            db.session.add(admin)
-            db.session.commit()
-            print("Admin user created: admin / admin123")
-    
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    app.run(debug=True, port=5000)
@@ -0,0 +1,48 @@
+"""
+Doctor photo rendering
+Pure Pillow functions run in a process pool by hospital.py; nothing here imports the Flask app
+"""
+
+import hashlib
+import os
+
+from PIL import Image, ImageDraw, ImageFont, ImageOps
+
+PLACEHOLDER_SIZE = 512
+PLACEHOLDER_COLORS = ['#4a9eff', '#ff9a56', '#7b68ee', '#2ecc71', '#e67e22', '#16a085', '#e84393', '#6c5ce7']
+SAVE_OPTIONS = {
+    'WEBP': {'quality': 80, 'method': 4},
+    'JPEG': {'quality': 82, 'optimize': True, 'progressive': True},
+}
+
+
+def initials(name):
+    """Initials for an avatar, ignoring titles such as 'Dr.'"""
+    words = [w for w in name.replace('.', ' ').split() if w.lower() not in ('dr', 'prof', 'mr', 'mrs', 'ms')]
+    return ''.join(w[0] for w in words[:2]).upper() or '?'
+
+
+def create_placeholder_avatar(name, dest):
+    """Draw an initials avatar for a doctor without a photo and save it as PNG"""
+    color = PLACEHOLDER_COLORS[int(hashlib.sha256(name.encode('utf-8')).hexdigest(), 16) % len(PLACEHOLDER_COLORS)]
+    img = Image.new('RGB', (PLACEHOLDER_SIZE, PLACEHOLDER_SIZE), color)
+    draw = ImageDraw.Draw(img)
+    font = ImageFont.load_default(size=PLACEHOLDER_SIZE // 3)
+    draw.text((PLACEHOLDER_SIZE / 2, PLACEHOLDER_SIZE / 2), initials(name), fill='white', font=font, anchor='mm')
+    save_atomically(img, dest, 'PNG')
+
+
+def render_variant(source_path, size, image_format, dest):
+    """Square-crop and resize a source image into one cached variant"""
+    with Image.open(source_path) as source:
+        img = ImageOps.exif_transpose(source).convert('RGB')
+    img = ImageOps.fit(img, (size, size), Image.LANCZOS)
+    save_atomically(img, dest, image_format, **SAVE_OPTIONS.get(image_format, {}))
+    return dest
+
+
+def save_atomically(img, dest, image_format, **options):
+    # Concurrent renders of the same variant must never expose a half-written file
+    tmp = f'{dest}.{os.getpid()}.tmp'
+    img.save(tmp, image_format, **options)
+    os.replace(tmp, dest)
@@ -0,0 +1,248 @@
+"""
+Production launcher for the Children's Hospital Website
+Loads the app once in a master process, then forks workers that share its memory copy-on-write
+
+Usage: python serve.py --workers 4 --port 8000
+
+Signals sent to the master:
+    HUP         start a fresh set of workers, then gracefully stop the old ones
+    USR2        re-exec the master (picks up deployed code) without closing the socket
+    TERM/INT    gracefully stop all workers and exit
+"""
+
+import argparse
+import gc
+import os
+import resource
+import signal
+import socket
+import sys
+import threading
+import time
+
+from werkzeug.serving import make_server, WSGIRequestHandler
+
+LISTEN_FD_ENV = 'HOSP_LISTEN_FD'
+OLD_WORKERS_ENV = 'HOSP_OLD_WORKERS'
+KEEPALIVE_TIMEOUT = 5  # seconds an idle keep-alive connection is held open
+
+
+def log(message):
+    print(f"[serve {os.getpid()}] {message}", flush=True)
+
+
+def memory_usage():
+    """Resident and shared (including copy-on-write) memory of this process in MiB"""
+    try:
+        fields = {}
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == 'kB':
+                    fields[parts[0].rstrip(':')] = int(parts[1])
+        shared = fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0)
+        return fields['Rss'] / 1024, shared / 1024
+    except (OSError, KeyError):
+        # Not Linux: peak RSS is the best available figure (KiB on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 0.0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Sunshine Children's Hospital production server")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2)
+    parser.add_argument('--graceful-timeout', type=float, default=30.0,
+                        help='Seconds old workers get to finish in-flight requests')
+    return parser.parse_args()
+
+
+def open_listen_socket(host, port):
+    """Reuse the socket handed over by a previous master, or bind a new one"""
+    if LISTEN_FD_ENV in os.environ:
+        sock = socket.socket(fileno=int(os.environ.pop(LISTEN_FD_ENV)))
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host, port))
+        sock.listen(1024)
+    sock.set_inheritable(True)
+    return sock
+
+
+class RequestHandler(WSGIRequestHandler):
+    # Idle keep-alive connections time out, so they cannot hold a draining worker open
+    timeout = KEEPALIVE_TIMEOUT
+
+
+def worker_main(app, sock, args, forked_at):
+    """Serve requests on the shared socket until told to stop"""
+    first_request = threading.Event()
+
+    def measured_app(environ, start_response):
+        if first_request.is_set():
+            return app(environ, start_response)
+        first_request.set()
+        started = time.perf_counter()
+        response = app(environ, start_response)
+        rss, shared = memory_usage()
+        log(f"first request handled in {(time.perf_counter() - started) * 1000:.1f} ms, "
+            f"{(time.perf_counter() - forked_at) * 1000:.1f} ms after fork; "
+            f"rss {rss:.1f} MiB ({shared:.1f} MiB shared)")
+        return response
+
+    server = make_server(args.host, args.port, measured_app, threaded=True, fd=sock.fileno(),
+                         request_handler=RequestHandler)
+    # Werkzeug runs requests on daemon threads; joinable ones let server_close()
+    # wait for in-flight requests before the worker exits
+    server.daemon_threads = False
+
+    def stop(signum, frame):
+        # shutdown() blocks until serve_forever() returns, so call it off the main thread
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    signal.signal(signal.SIGUSR2, signal.SIG_IGN)
+
+    rss, shared = memory_usage()
+    log(f"worker ready in {(time.perf_counter() - forked_at) * 1000:.1f} ms; "
+        f"rss {rss:.1f} MiB ({shared:.1f} MiB shared)")
+    server.serve_forever()
+    server.server_close()
+    # Renderer processes wait for their parent to stop them, and os._exit() skips that
+    from hospital import shutdown_photo_pool
+    shutdown_photo_pool()
+
+
+class Master:
+    def __init__(self, app, sock, args):
+        self.app = app
+        self.sock = sock
+        self.args = args
+        self.workers = set()
+        self.pending_signals = []
+
+    def spawn_worker(self):
+        forked_at = time.perf_counter()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                worker_main(self.app, self.sock, self.args, forked_at)
+            finally:
+                os._exit(0)
+        self.workers.add(pid)
+        return pid
+
+    def spawn_workers(self):
+        return {self.spawn_worker() for _ in range(self.args.workers)}
+
+    def stop_workers(self, pids):
+        """Ask workers to finish in-flight requests, killing any that overrun the timeout"""
+        for pid in pids:
+            self.signal_worker(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.args.graceful_timeout
+        remaining = set(pids)
+        while remaining and time.monotonic() < deadline:
+            exited = self.reap()
+            remaining -= exited
+            # A current worker dying meanwhile is replaced here, as the main loop would
+            for pid in exited - set(pids):
+                log(f"worker {pid} exited, starting a replacement")
+                self.spawn_worker()
+            time.sleep(0.1)
+        for pid in remaining:
+            self.signal_worker(pid, signal.SIGKILL)
+            # Wait for this pid only: other workers are still running
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+            self.workers.discard(pid)
+
+    def signal_worker(self, pid, signum):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            self.workers.discard(pid)
+
+    def reap(self):
+        """Collect exited workers; returns their pids"""
+        exited = set()
+        while True:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            exited.add(pid)
+            self.workers.discard(pid)
+        return exited
+
+    def rotate(self):
+        log("rotating workers")
+        old = set(self.workers)
+        self.spawn_workers()
+        self.stop_workers(old)
+
+    def reexec(self):
+        log("re-executing master")
+        os.environ[LISTEN_FD_ENV] = str(self.sock.fileno())
+        os.environ[OLD_WORKERS_ENV] = ','.join(str(pid) for pid in self.workers)
+        os.execv(sys.executable, [sys.executable] + sys.argv)
+
+    def handle_signal(self, signum, frame):
+        self.pending_signals.append(signum)
+
+    def run(self):
+        for signum in (signal.SIGHUP, signal.SIGUSR2, signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, self.handle_signal)
+
+        # Workers of the master we were exec'd from are still our children
+        previous = {int(pid) for pid in os.environ.pop(OLD_WORKERS_ENV, '').split(',') if pid}
+        self.workers |= previous
+        self.spawn_workers()
+        if previous:
+            self.stop_workers(previous)
+
+        while True:
+            while self.pending_signals:
+                signum = self.pending_signals.pop(0)
+                if signum == signal.SIGHUP:
+                    self.rotate()
+                elif signum == signal.SIGUSR2:
+                    self.reexec()
+                else:
+                    log("shutting down")
+                    self.stop_workers(set(self.workers))
+                    return
+            # Replace workers that died unexpectedly
+            for pid in self.reap():
+                log(f"worker {pid} exited, starting a replacement")
+                self.spawn_worker()
+            time.sleep(0.5)
+
+
+def main():
+    args = parse_args()
+    sock = open_listen_socket(args.host, args.port)
+
+    started = time.perf_counter()
+    from hospital import app, setup_application, warm_up
+    setup_application()
+    warm_up()
+    # Keep the preloaded heap out of the collector so its refcount writes don't unshare pages
+    gc.collect()
+    gc.freeze()
+    rss, _ = memory_usage()
+    log(f"app loaded and warmed in {(time.perf_counter() - started) * 1000:.1f} ms; "
+        f"master rss {rss:.1f} MiB; serving on {args.host}:{args.port} with {args.workers} workers")
+
+    Master(app, sock, args).run()
+
+
+if __name__ == '__main__':
+    main()